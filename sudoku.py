@@ -4,10 +4,17 @@ import random
 import json
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QGridLayout, QPushButton, QVBoxLayout, QHBoxLayout,
-    QMessageBox, QLineEdit, QLabel, QComboBox, QMainWindow, QFileDialog
+    QMessageBox, QLineEdit, QLabel, QComboBox, QMainWindow, QFileDialog, QSpacerItem
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIntValidator, QFont
+from sudoku_kernel import BOX_OF, build_masks, count_solutions, fill, shuffle_solution
+
+def _decode_grid(data):
+    """Converts a saved puzzle or solution back to a 9x9 uint8 array"""
+    if isinstance(data, list):  # Older saves store nested lists
+        return np.array(data, dtype=np.uint8)
+    return np.frombuffer(bytes.fromhex(data), dtype=np.uint8).reshape(9, 9)
 
 class SudokuGame(QMainWindow):
     def __init__(self):
@@ -15,6 +22,10 @@ class SudokuGame(QMainWindow):
         self.initUI()  # Initialize the user interface
         self.game_data = None  # Initialize game data to None
         self.errors = 0  # Initialize errors counter to 0
+        self._filled_cells = set()  # Editable cells currently holding their correct number
+        self._target = 0  # Number of editable cells in the current puzzle
+        self._seed_solution = bytearray(81)  # Solved grid every new solution is derived from
+        self.fill_grid(self._seed_solution)
 
     def initUI(self):
         """Initialize the main user interface"""
@@ -40,6 +51,7 @@ class SudokuGame(QMainWindow):
         # Sudoku grid setup
         self.grid_layout = QGridLayout()
         self.cells = []
+        self._cell_index = {}  # Maps id() of each cell widget to its (row, col)
         for row in range(9):
             row_cells = []
             for col in range(9):
@@ -50,11 +62,20 @@ class SudokuGame(QMainWindow):
                 cell.setValidator(QIntValidator(1, 9))
                 cell.textChanged.connect(self.check_input)  # Connect text changed signal to check_input function
                 cell.setFont(QFont("Arial", 16))
-                self.grid_layout.addWidget(cell, row, col)  # Add cell widget to grid layout
+                self.grid_layout.addWidget(cell, row + row // 3, col + col // 3)  # Add cell widget to grid layout, skipping gap rows/columns
                 row_cells.append(cell)
+                self._cell_index[id(cell)] = (row, col)
             self.cells.append(row_cells)
+
+        # Add visual separation between 3x3 blocks
+        for gap in (3, 7):
+            self.grid_layout.addItem(QSpacerItem(4, 4), gap, gap)  # Gives both gap row and gap column their size
         self.main_layout.addLayout(self.grid_layout)
 
+        # Mistakes counter setup
+        self.status_label = QLabel('Mistakes: 0/3')
+        self.main_layout.addWidget(self.status_label)
+
         # Buttons setup
         self.buttons_layout = QHBoxLayout()
         self.new_game_button = QPushButton('New Game')
@@ -107,9 +128,9 @@ class SudokuGame(QMainWindow):
             file_name, _ = QFileDialog.getSaveFileName(self, "Save Game", "", "Sudoku Files (*.sudoku);;All Files (*)", options=options)
             if file_name:
                 save_data = {
-                    'puzzle': self.game_data['puzzle'].tolist(),  # Convert puzzle numpy array to list
-                    'solution': self.game_data['solution'].tolist(),  # Convert solution numpy array to list
-                    'grid': [[cell.text() for cell in row] for row in self.cells]  # Get text from each cell in grid
+                    'puzzle': self.game_data['puzzle'].astype(np.uint8).tobytes().hex(),  # Store puzzle as 81 hex bytes
+                    'solution': self.game_data['solution'].astype(np.uint8).tobytes().hex(),  # Store solution as 81 hex bytes
+                    'grid': ''.join(cell.text() or '.' for row in self.cells for cell in row)  # One character per cell, '.' if empty
                 }
                 with open(file_name, 'w') as file:
                     json.dump(save_data, file)  # Write save_data to file in JSON format
@@ -122,12 +143,17 @@ class SudokuGame(QMainWindow):
             with open(file_name, 'r') as file:
                 load_data = json.load(file)  # Load data from file using JSON
                 self.game_data = {
-                    'puzzle': np.array(load_data['puzzle']),  # Convert puzzle list to numpy array
-                    'solution': np.array(load_data['solution'])  # Convert solution list to numpy array
+                    'puzzle': _decode_grid(load_data['puzzle']),  # Convert saved puzzle to numpy array
+                    'solution': _decode_grid(load_data['solution'])  # Convert saved solution to numpy array
                 }
-                for r, row in enumerate(load_data['grid']):
-                    for c, value in enumerate(row):
-                        self.cells[r][c].setText(value)  # Set text in each cell based on loaded data
+                grid = load_data['grid']
+                if isinstance(grid, list):  # Older saves store the cell texts as nested lists
+                    grid = ''.join(value or '.' for row in grid for value in row)
+                self.update_grid()  # Show the puzzle and reset the filled cell tracking
+                for i, value in enumerate(grid):
+                    r, c = divmod(i, 9)
+                    if value != '.' and self.game_data['puzzle'][r][c] == 0:
+                        self.cells[r][c].setText(value)  # Set text in each editable cell based on loaded data
 
     def quit(self):
         """Quits the application"""
@@ -136,128 +162,85 @@ class SudokuGame(QMainWindow):
     def generate_sudoku(self, difficulty):
         """Generates a Sudoku puzzle based on difficulty"""
         # Generate a complete Sudoku solution
-        solution = np.zeros((9, 9), dtype=int)
-        self.fill_grid(solution)  # Fill the solution grid
-        puzzle = solution.copy()
+        solution = shuffle_solution(self._seed_solution)  # Flat grid, cell (r, c) at index r * 9 + c
+        puzzle = bytearray(solution)
         if difficulty == 'Easy':
             self.remove_numbers(puzzle, 40)  # Remove numbers for easy difficulty
         elif difficulty == 'Medium':
             self.remove_numbers(puzzle, 50)  # Remove numbers for medium difficulty
         else:
             self.remove_numbers(puzzle, 60)  # Remove numbers for hard difficulty
-        return {'puzzle': puzzle, 'solution': solution}  # Return puzzle and solution as dictionary
+        grids = np.frombuffer(solution + puzzle, dtype=np.uint8).reshape(2, 9, 9)  # Both grids in one 162-byte buffer
+        return {'puzzle': grids[1], 'solution': grids[0]}  # Return puzzle and solution as dictionary
 
     def remove_numbers(self, grid, count):
-        """Randomly removes numbers from the Sudoku puzzle"""
-        attempts = 0
-        max_attempts = 81 * 10
-        while count > 0 and attempts < max_attempts:
-            row = random.randint(0, 8)
-            col = random.randint(0, 8)
-            if grid[row][col] != 0:
-                backup = grid[row][col]
-                grid[row][col] = 0
-                grid_copy = grid.copy()
-                if self.solve_grid(grid_copy):
+        """Randomly removes numbers from the flat Sudoku puzzle while keeping its solution unique"""
+        rmask, cmask, bmask = build_masks(grid)
+        empties = [i for i in range(81) if grid[i] == 0]
+        for i in random.sample(range(81), 81):  # Try each cell once, in random order
+            if count == 0:
+                break
+            number = grid[i]
+            if number:
+                row, col = divmod(i, 9)
+                bit = 1 << (number - 1)
+                box = BOX_OF[i]
+                grid[i] = 0
+                rmask[row] ^= bit
+                cmask[col] ^= bit
+                bmask[box] ^= bit
+                empties.append(i)
+                forced = (rmask[row] | cmask[col] | bmask[box]) == 0x1FF ^ bit  # Peers leave only this number
+                if forced or count_solutions(grid, rmask, cmask, bmask, empties) == 1:
                     count -= 1
                 else:
-                    grid[row][col] = backup
-            attempts += 1
+                    empties.pop()
+                    grid[i] = number
+                    rmask[row] |= bit
+                    cmask[col] |= bit
+                    bmask[box] |= bit
 
     def fill_grid(self, grid):
-        """Recursively fills the Sudoku grid"""
-        numbers = list(range(1, 10))
-        for i in range(0, 81):
-            row = i // 9
-            col = i % 9
-            if grid[row][col] == 0:
-                random.shuffle(numbers)
-                for number in numbers:
-                    if self.is_safe(grid, row, col, number):
-                        grid[row][col] = number
-                        if self.find_empty_location(grid) is None:
-                            return True
-                        else:
-                            if self.fill_grid(grid):
-                                return True
-                break
-        grid[row][col] = 0
-        return False
-
-    def solve_grid(self, grid):
-        """Recursively solves the Sudoku grid"""
-        location = self.find_empty_location(grid)
-        if not location:
-            return True
-        row, col = location
-        for number in range(1, 10):
-            if self.is_safe(grid, row, col, number):
-                grid[row][col] = number
-                if self.solve_grid(grid):
-                    return True
-                grid[row][col] = 0
-        return False
-
-    def is_safe(self, grid, row, col, number):
-        """Checks if it's safe to place a number in a given position"""
-        return (number not in grid[row] and
-                number not in grid[:, col] and
-                number not in grid[row - row % 3:row - row % 3 + 3, col - col % 3:col - col % 3 + 3])
-
-    def find_empty_location(self, grid):
-        """Finds the first empty location in the Sudoku grid"""
-        for i in range(9):
-            for j in range(9):
-                if grid[i][j] == 0:
-                    return (i, j)
-        return None
+        """Fills the flat Sudoku grid with a random complete solution"""
+        empties = [i for i in range(80, -1, -1) if grid[i] == 0]  # Reversed so cells are filled in reading order
+        return fill(grid, *build_masks(grid), empties)
 
     def update_grid(self):
         for r in range(9):
             for c in range(9):
+                self.cells[r][c].blockSignals(True)  # Don't run check_input for programmatic changes
                 if self.game_data['puzzle'][r][c] != 0:
                     self.cells[r][c].setText(str(self.game_data['puzzle'][r][c]))  # Set cell text from puzzle data
                     self.cells[r][c].setReadOnly(True)  # Set cell as read-only if it's pre-filled
                 else:
                     self.cells[r][c].setText('')  # Clear cell text if it's empty
                     self.cells[r][c].setReadOnly(False)  # Set cell as editable if it's empty
+                self.cells[r][c].blockSignals(False)
+        self._filled_cells = set()  # No editable cell has been filled yet
+        self._target = 81 - np.count_nonzero(self.game_data['puzzle'])
+        self.status_label.setText(f'Mistakes: {self.errors}/3')
 
-    # Add visual separation between 3x3 blocks
-        for r in range(9):
-            for c in range(9):
-                if (r % 3 == 0 and r != 0) or (c % 3 == 0 and c != 0):
-                    if c % 3 == 0 and c != 0:
-                        spacer = QWidget()
-                        spacer.setFixedSize(4, 4)
-                        self.grid_layout.addWidget(spacer, r, c)  # Add spacer widget to grid layout
-                    if r % 3 == 0 and r != 0:
-                        spacer = QWidget()
-                        spacer.setFixedSize(4, 4)
-                        self.grid_layout.addWidget(spacer, r, c)  # Add spacer widget to grid layout
-                        
     def check_input(self):
         """Checks if the input in a cell is correct"""
         sender = self.sender()  # Get the sender object (QLineEdit)
+        row, col = self._cell_index[id(sender)]  # Find the cell corresponding to the sender
+        self._filled_cells.discard((row, col))  # Any change replaces a previously correct entry
         if not sender.text():  # If text is empty, return
             return
-        row, col = None, None
-        for r in range(9):
-            for c in range(9):
-                if self.cells[r][c] == sender:  # Find the cell corresponding to the sender
-                    row, col = r, c
-                    break
-        if row is not None and col is not None:
-            if int(sender.text()) != self.game_data['solution'][row][col]:
-                self.errors += 1
-                if self.errors >= 3:
-                    QMessageBox.warning(self, 'Game Over', 'You have made 3 mistakes. Game over!')
-                    self.new_game()  # Start a new game on game over
-                else:
-                    QMessageBox.warning(self, 'Incorrect', f'Incorrect number! Mistakes: {self.errors}/3')
-                sender.clear()  # Clear incorrect input from cell
+        if int(sender.text()) != self.game_data['solution'][row][col]:
+            self.errors += 1
+            sender.clear()  # Clear incorrect input from cell
+            if self.errors >= 3:
+                QMessageBox.warning(self, 'Game Over', 'You have made 3 mistakes. Game over!')
+                self.new_game()  # Start a new game on game over
             else:
-                if all(self.cells[r][c].text() for r in range(9) for c in range(9)):
-                    QMessageBox.information(self, 'You Win!', 'Congratulations! You have completed the Sudoku.')  # Show win message
+                self.status_label.setText(f'Mistakes: {self.errors}/3')
+                sender.setStyleSheet('background-color: #f99;')  # Flash the cell red
+                QTimer.singleShot(500, lambda: sender.setStyleSheet(''))
+        else:
+            self._filled_cells.add((row, col))
+            if len(self._filled_cells) == self._target:
+                QMessageBox.information(self, 'You Win!', 'Congratulations! You have completed the Sudoku.')  # Show win message
 
 def main():
     """Main function to run the Sudoku game"""
@@ -0,0 +1,92 @@
+import random
+
+RANGE_1_9 = (1, 2, 3, 4, 5, 6, 7, 8, 9)  # Digits that can be placed in a cell
+BOX_OF = bytes((r // 3) * 3 + c // 3 for r in range(9) for c in range(9))  # Box number of each flat cell index
+
+def build_masks(grid):
+    """Builds the row, column and box bitmasks from the numbers already in a flat grid"""
+    rmask, cmask, bmask = [0] * 9, [0] * 9, [0] * 9
+    for i in range(81):
+        number = grid[i]
+        if number:
+            bit = 1 << (number - 1)
+            row, col = divmod(i, 9)
+            rmask[row] |= bit
+            cmask[col] |= bit
+            bmask[BOX_OF[i]] |= bit
+    return rmask, cmask, bmask
+
+def fill(grid, rmask, cmask, bmask, empties):
+    """Recursively fills a flat Sudoku grid with random numbers"""
+    if not empties:
+        return True
+    i = empties.pop()
+    row, col = divmod(i, 9)
+    box = BOX_OF[i]
+    for number in random.sample(RANGE_1_9, 9):
+        bit = 1 << (number - 1)
+        if not (rmask[row] | cmask[col] | bmask[box]) & bit:
+            grid[i] = number
+            rmask[row] |= bit
+            cmask[col] |= bit
+            bmask[box] |= bit
+            if fill(grid, rmask, cmask, bmask, empties):
+                return True
+            rmask[row] ^= bit
+            cmask[col] ^= bit
+            bmask[box] ^= bit
+    grid[i] = 0
+    empties.append(i)
+    return False
+
+def count_solutions(grid, rmask, cmask, bmask, empties, limit=2):
+    """Counts the solutions of a flat Sudoku grid, stopping once limit is reached.
+
+    The grid, masks and empty cell list are left exactly as they were found."""
+    if not empties:
+        return 1
+    # Pick the empty cell with the minimum remaining values
+    best, best_count, candidates = 0, 10, 0
+    for j, i in enumerate(empties):
+        row, col = divmod(i, 9)
+        cell_candidates = ~(rmask[row] | cmask[col] | bmask[BOX_OF[i]]) & 0x1FF
+        count = cell_candidates.bit_count()  # Python 3.10+
+        if count < best_count:
+            best, best_count, candidates = j, count, cell_candidates
+            if count <= 1:
+                break
+    i = empties[best]
+    empties[best] = empties[-1]
+    empties.pop()
+    row, col = divmod(i, 9)
+    box = BOX_OF[i]
+    found = 0
+    while candidates and found < limit:
+        bit = candidates & -candidates  # Lowest remaining candidate
+        candidates ^= bit
+        grid[i] = bit.bit_length()
+        rmask[row] |= bit
+        cmask[col] |= bit
+        bmask[box] |= bit
+        found += count_solutions(grid, rmask, cmask, bmask, empties, limit - found)
+        rmask[row] ^= bit
+        cmask[col] ^= bit
+        bmask[box] ^= bit
+    grid[i] = 0
+    empties.append(i)
+    empties[best], empties[-1] = empties[-1], empties[best]
+    return found
+
+def shuffle_solution(grid):
+    """Returns a random solved grid equivalent to the given flat solution.
+
+    Relabelling digits, permuting bands, stacks and the rows and columns inside them,
+    and transposing all keep a solved grid valid."""
+    digits = bytes((0, *random.sample(RANGE_1_9, 9))) + bytes(246)  # Translation table relabelling 1-9
+    rows = [band * 3 + r for band in random.sample(range(3), 3) for r in random.sample(range(3), 3)]
+    cols = [stack * 3 + c for stack in random.sample(range(3), 3) for c in random.sample(range(3), 3)]
+    if random.getrandbits(1):
+        cells = [r * 9 + c for c in cols for r in rows]  # Transposed
+    else:
+        cells = [r * 9 + c for r in rows for c in cols]
+    return bytearray(grid[i] for i in cells).translate(digits)